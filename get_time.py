@@ -4,7 +4,7 @@ from datetime import datetime
 
 
 time_format = '%Y-%m-%dT%H:%M:%SZ'
-file = open(sys.argv[1], 'r')
+file = sys.stdin if sys.argv[1] == '-' else open(sys.argv[1], 'r')
 json_file = json.load(file)
 
 start_times = []
@@ -3,6 +3,7 @@ import subprocess, os
 from datetime import datetime
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 def setup_mcperf_agents(force_install = False):
     """
@@ -90,48 +91,50 @@ def setup_mcperf_agents(force_install = False):
     
     ssh_key_path = os.path.expanduser("~/.ssh/cloud-computing")
     
-    for node_key in ["client_agent_a", "client_agent_b", "client_measure"]:
-        node = clients_info[node_key]
+    node_keys = ["client_agent_a", "client_agent_b", "client_measure"]
 
+    def mcperf_installed(node):
+        check_cmd = (
+            f"gcloud compute ssh --ssh-key-file {ssh_key_path} "
+            f"ubuntu@{node['name']} --zone europe-west1-b --command "
+            f"\"test -x ~/memcache-perf-dynamic/mcperf && echo INSTALLED || echo MISSING\""
+        )
+        return run_command(check_cmd, capture_output=True).strip() == "INSTALLED"
+
+    def install_mcperf(node):
         # Check if mcperf is already installed
-        if not force_install:
-            check_cmd = (
-                f"gcloud compute ssh --ssh-key-file {ssh_key_path} "
-                f"ubuntu@{node['name']} --zone europe-west1-b --command "
-                f"\"test -x ~/memcache-perf-dynamic/mcperf && echo INSTALLED || echo MISSING\""
+        if not force_install and mcperf_installed(node):
+            print(
+                f"[STATUS] setup_mcperf_agents: mcperf already installed " +
+                f"on {node['name']}, skipping setup"
             )
-            result = run_command(check_cmd, capture_output=True).strip()
-            if result == "INSTALLED":
-                print(
-                    f"[STATUS] setup_mcperf_agents: mcperf already installed " +
-                    f"on {node['name']}, skipping setup"
-                )
-                continue
+            return
 
         # Otherwise run setup commands
         print(
             f"[STATUS] setup_mcperf_agents: setting up mcperf on " +
             f"{node['name']}"
         )
-        for cmd in setup_commands:
-            ssh_cmd = (
-                f"gcloud compute ssh --ssh-key-file {ssh_key_path} "
-                f"ubuntu@{node['name']} --zone europe-west1-b --command "
-                f"\"{cmd}\""
-            )
-            # Don't check as some commands might fail but still be ok
-            run_command(ssh_cmd, check=False)
-
-    # Verification: ensure mcperf was built correctly
-    for node_key in ["client_agent_a", "client_agent_b", "client_measure"]:
-        node = clients_info[node_key]
-        verify_cmd = (
+        # Run all setup steps in a single SSH session. They are joined with
+        # ';' rather than '&&' as some commands might fail but still be ok
+        ssh_cmd = (
             f"gcloud compute ssh --ssh-key-file {ssh_key_path} "
             f"ubuntu@{node['name']} --zone europe-west1-b --command "
-            f"\"test -x ~/memcache-perf-dynamic/mcperf && echo INSTALLED || echo MISSING\""
+            f"\"{'; '.join(setup_commands)}\""
         )
-        output = run_command(verify_cmd, capture_output=True).strip()
-        if output != "INSTALLED":
+        run_command(ssh_cmd, check=False)
+
+    # The nodes are independent and the work is network-bound, so set them up
+    # in parallel
+    nodes = [clients_info[node_key] for node_key in node_keys]
+    with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+        list(executor.map(install_mcperf, nodes))
+
+        # Verification: ensure mcperf was built correctly
+        verified = list(executor.map(mcperf_installed, nodes))
+
+    for node, installed in zip(nodes, verified):
+        if not installed:
             print(
                 f"[ERROR] setup_mcperf_agents: mcperf installation failed on " + 
                 f"{node['name']}"
@@ -212,8 +215,8 @@ def restart_mcperf_agents(clients_info):
         f"waiting for cleanup..."
     )
     ssh_key_path = os.path.expanduser("~/.ssh/cloud-computing")
-    for node_key in ['client_agent_a', 'client_agent_b', 'client_measure']:
-        node = clients_info[node_key]
+
+    def wait_for_exit(node):
         while True:
             check_cmd = (
                 f"gcloud compute ssh --quiet --ssh-key-file {ssh_key_path} "
@@ -224,6 +227,14 @@ def restart_mcperf_agents(clients_info):
             if not output:
                 break
             time.sleep(1)
+
+    # Poll all nodes concurrently rather than one after the other
+    nodes = [
+        clients_info[node_key]
+        for node_key in ['client_agent_a', 'client_agent_b', 'client_measure']
+    ]
+    with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+        list(executor.map(wait_for_exit, nodes))
     print(
         "[STATUS] restart_mcperf_agents: all previous mcperf processes exited"
     )
@@ -308,10 +319,10 @@ def run_mcperf_load(
 
     This function:
     1) Creates an experiment directory if needed.
-    2) Writes a remote start_load.sh script with the desired mcperf command.
-    3) Copies the script to client-measure and makes it executable.
-    4) SSHes into client-measure to run the script, redirecting stdout to a file
-       under output_dir.
+    2) Writes a local start_load.sh script with the desired mcperf command.
+    3) SSHes into client-measure once to upload the script over stdin, make
+       it executable and run it, redirecting stdout to a file under
+       output_dir.
 
     Parameters
     ----------
@@ -356,24 +367,18 @@ def run_mcperf_load(
     with open(script_path, "w") as f:
         f.write(script_contents)
 
-    # Copy and prepare on client-measure
-    scp = (
-        f"gcloud compute scp --ssh-key-file {ssh_key} {script_path} "
-        f"ubuntu@{measure['name']}:~ --zone europe-west1-b"
-    )
-    run_command(scp, check=False)
-    chmod = (
-        f"gcloud compute ssh --ssh-key-file {ssh_key} ubuntu@{measure['name']} "
-        f"--zone europe-west1-b --command \"chmod +x ~/{remote_script}\""
-    )
-    run_command(chmod, check=False)
-
-    # Execute remote load in background via nohup, logging to remote file
+    # Stream the script over the SSH session's stdin instead of a separate
+    # scp, then make it executable and execute remote load in background via
+    # nohup in the same session, logging to remote file
     remote_results = "~/mcperf_results_remote.txt"
+    # Only nohup is backgrounded: a backgrounded list would get /dev/null as
+    # stdin and cat would upload an empty script
     ssh_run = (
         f"gcloud compute ssh --ssh-key-file {ssh_key} ubuntu@{measure['name']} "
         f"--zone europe-west1-b --command "
-        f"\"nohup ~/{remote_script} > {remote_results} 2>&1 &\""
+        f"\"cat > ~/{remote_script} && chmod +x ~/{remote_script} && "
+        f"{{ nohup ~/{remote_script} > {remote_results} 2>&1 < /dev/null & }}\" "
+        f"< {script_path}"
     )
     run_command(ssh_run, check=False)
     print(
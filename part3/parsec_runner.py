@@ -1,5 +1,11 @@
-import subprocess, time, json
+import subprocess, time
 import os
+import threading
+import functools
+import string
+import heapq
+import atexit
+from collections import defaultdict
 from utils import run_command
 
 # node-a-2core : e2-highmem-2
@@ -7,6 +13,188 @@ from utils import run_command
 # node-c-4core : c3-highcpu-4
 # node-d-4core : n2-standard-4
 
+## Job watch stream
+job_watcher = None
+# One line per watch event: event type, job name and succeeded count (empty
+# while the job is still running)
+JOB_EVENT_JSONPATH = (
+    'jsonpath={.type} {.object.metadata.name} '
+    '{.object.status.succeeded}{"\\n"}'
+)
+# One line per job: job name and succeeded count, used to rebuild the state
+# when the watch stream has to be restarted
+JOB_LIST_JSONPATH = (
+    'jsonpath={range .items[*]}{.metadata.name} '
+    '{.status.succeeded}{"\\n"}{end}'
+)
+
+class JobWatcher:
+    """
+    Tracks completed Kubernetes Jobs from one long-running
+    `kubectl get jobs --watch` stream, so that callers can check job status
+    without spawning kubectl and re-listing every job on each poll.
+    """
+
+    def __init__(self):
+        self.completed_jobs = set()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.process = self._start_watch()
+        self.thread = threading.Thread(target = self._watch, daemon = True)
+        self.thread.start()
+
+    def _start_watch(self):
+        return subprocess.Popen(
+            [
+                "kubectl", "get", "jobs", "--watch", "-o", JOB_EVENT_JSONPATH,
+                "--output-watch-events"
+            ],
+            stdout = subprocess.PIPE,
+            text = True
+        )
+
+    def _watch(self):
+        # The API server closes watch streams after its request timeout, and
+        # connection drops end them too, so the stream is restarted whenever
+        # kubectl exits
+        while True:
+            # kubectl only prints the fields we need, so no JSON has to be
+            # parsed
+            for line in self.process.stdout:
+                fields = line.split()
+                if len(fields) < 2:
+                    continue
+                event_type, job_name = fields[0], fields[1]
+                succeeded = int(fields[2]) if len(fields) > 2 else 0
+
+                with self.condition:
+                    if event_type == "DELETED":
+                        self.completed_jobs.discard(job_name)
+                    elif succeeded >= 1:
+                        self.completed_jobs.add(job_name)
+                        self.condition.notify_all()
+
+            returncode = self.process.wait()
+            if self.closed:
+                return
+            print(
+                f"[WARNING] JobWatcher: kubectl watch exited with code " +
+                f"{returncode}, restarting it"
+            )
+            if not self._restart_watch():
+                return
+
+    def _restart_watch(self):
+        # Retry until kubectl can be started again, an exception here would
+        # otherwise end the thread and freeze the job state
+        while not self.closed:
+            time.sleep(1)
+            try:
+                self._relist_jobs()
+                process = self._start_watch()
+            except OSError as e:
+                print(f"[WARNING] JobWatcher: could not restart kubectl watch: {e}")
+                continue
+
+            with self.condition:
+                if not self.closed:
+                    self.process = process
+                    return True
+            process.terminate()
+            process.wait()
+        return False
+
+    def close(self):
+        """
+        Stops the watch stream and its kubectl process.
+        """
+        with self.condition:
+            self.closed = True
+            process = self.process
+        process.terminate()
+        process.wait()
+
+    def _relist_jobs(self):
+        # Jobs may have completed or been deleted while no stream was open, so
+        # rebuild the state from a full listing before watching again
+        result = subprocess.run(
+            ["kubectl", "get", "jobs", "-o", JOB_LIST_JSONPATH],
+            capture_output = True,
+            text = True
+        )
+        if result.returncode != 0:
+            print(
+                f"[WARNING] JobWatcher: kubectl get jobs exited with code " +
+                f"{result.returncode}, keeping the previous job state"
+            )
+            return
+
+        completed_jobs = set()
+        for line in result.stdout.splitlines():
+            fields = line.split()
+            if len(fields) > 1 and int(fields[1]) >= 1:
+                completed_jobs.add(fields[0])
+        with self.condition:
+            self.completed_jobs = completed_jobs
+            self.condition.notify_all()
+
+    def get_completed_jobs(self):
+        """
+        Returns a snapshot of the names of all Jobs that have succeeded.
+        """
+        with self.condition:
+            return set(self.completed_jobs)
+
+    def wait_for_update(self, completed_jobs, timeout):
+        """
+        Blocks until the set of succeeded Jobs differs from `completed_jobs`
+        (a snapshot from get_completed_jobs) or `timeout` seconds pass.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.completed_jobs != completed_jobs,
+                timeout = timeout
+            )
+
+def get_job_watcher():
+    """
+    Returns the shared JobWatcher, starting the watch stream on first use.
+    """
+    global job_watcher
+    if job_watcher is None:
+        job_watcher = JobWatcher()
+        # Do not leave kubectl running after the experiments exit
+        atexit.register(job_watcher.close)
+    return job_watcher
+
+@functools.lru_cache(maxsize = 64)
+def load_yaml_template(benchmark):
+    """
+    Reads the PARSEC job template for `benchmark` once and turns its
+    placeholders into `string.Template` fields.
+    
+    Parameters
+    ----------
+    benchmark : str
+        Name of the PARSEC benchmark (e.g., "radix").
+    
+    Returns
+    -------
+    string.Template
+        Template with `node_type`, `threads` and `cpuset_prefix` fields.
+    """
+    template_path = os.path.join(
+        "./parsec-benchmarks",
+        f"parsec-{benchmark}.yaml"
+    )
+    with open(template_path) as f:
+        content = f.read()
+
+    content = content.replace("NODE_TYPE", "${node_type}")
+    content = content.replace("THREAD_COUNT", "${threads}")
+    content = content.replace("CPUSET_PREFIX", "${cpuset_prefix}")
+    return string.Template(content)
+
 def modify_yaml_for_scheduling(
         benchmark,
         node_type,
@@ -37,20 +225,16 @@ def modify_yaml_for_scheduling(
     str
         Path to the modified YAML file.
     """
-    template_path = os.path.join(
-        "./parsec-benchmarks",
-        f"parsec-{benchmark}.yaml"
-    )
-    with open(template_path) as f:
-        content = f.read()
-
-    # Substitute placeholders in the YAML:
-    content = content.replace("NODE_TYPE", node_type)
-    content = content.replace("THREAD_COUNT", f"{threads}")
+    # Substitute placeholders in the cached template in a single pass
     if cpuset != "":
-        content = content.replace("CPUSET_PREFIX", f"taskset -c {cpuset} ")
+        cpuset_prefix = f"taskset -c {cpuset} "
     else:
-        content = content.replace("CPUSET_PREFIX", "")
+        cpuset_prefix = ""
+    content = load_yaml_template(benchmark).substitute(
+        node_type = node_type,
+        threads = threads,
+        cpuset_prefix = cpuset_prefix
+    )
 
     # Write modified YAML into workdir
     os.makedirs(workdir, exist_ok=True)
@@ -88,24 +272,22 @@ def launch_jobs(configs, workdir):
     # Record function start time for absolute delays
     start_time = time.time()
     
-    # Prepare the launch times file
+    # Launch times file, written as jobs are created
     launch_times_path = os.path.join(workdir, "launch_times.txt")
-    with open(launch_times_path, "w") as _:
-        pass
     
     # Track all job names for return value
     all_job_names = []
     
-    # Initialize pending_jobs as all jobs
-    pending_jobs = []
-    for bench, node_type, thr, cpu, delay, dependencies in configs:
+    # Initialize pending_jobs as all jobs, keyed by job name
+    pending_jobs = {}
+    for index, (bench, node_type, thr, cpu, delay, dependencies) in enumerate(configs):
         # Standardize job name to match Kubernetes naming convention
         job_name = f"parsec-{bench}"  
         all_job_names.append(job_name)
         
         standardized_dependencies = [f"parsec-{dep}" for dep in dependencies]
         
-        pending_jobs.append({
+        pending_jobs[job_name] = {
             "bench": bench,  # Keep original benchmark name for logging/YAML creation
             "node_type": node_type,
             "threads": thr,
@@ -113,52 +295,74 @@ def launch_jobs(configs, workdir):
             "delay": delay,
             "delay_until": start_time + delay,
             "dependencies": standardized_dependencies, 
-            "job_name": job_name  
-        })
+            "job_name": job_name,
+            "index": index  # Position in configs, keeps launch order for equal delays
+        }
+    
+    # Count unfinished dependencies per job and map each dependency to the
+    # jobs waiting on it, so completions only touch the jobs they unblock
+    pending_deps = {}
+    dependents = defaultdict(list)
+    for job_name, job in pending_jobs.items():
+        pending_deps[job_name] = len(job["dependencies"])
+        for dep in job["dependencies"]:
+            dependents[dep].append(job)
     
-    # Track completed jobs
+    # Jobs whose dependencies are satisfied, ordered by launch time and then
+    # by their order in configs
+    ready_jobs = []
+    def mark_ready(job):
+        heapq.heappush(
+            ready_jobs,
+            (job["delay_until"], job["index"], job)
+        )
+    for job_name, job in pending_jobs.items():
+        if pending_deps[job_name] == 0:
+            mark_ready(job)
+    
+    # Track completed jobs through the shared watch stream, only keeping the
+    # ones launched here
+    watcher = get_job_watcher()
+    job_name_set = frozenset(all_job_names)
     completed_jobs = set()
     
     # For periodic status reporting
     last_status_time = time.time() - 30
     
-    # Launch jobs that meet criteria (delay passed, dependencies satisfied)
-    while pending_jobs:
-        # Check and update completed jobs
-        out = subprocess.check_output(["kubectl", "get", "jobs", "-o", "json"])
-        data = json.loads(out)
-        for item in data["items"]:
-            job_name = item["metadata"]["name"]
-            if job_name in all_job_names and item["status"].get("succeeded", 0) >= 1:
+    # Open the launch times file once, line-buffered so that every entry is
+    # on disk as soon as its job is launched
+    with open(launch_times_path, "w", buffering = 1) as lt:
+        # Launch jobs that meet criteria (delay passed, dependencies satisfied)
+        while pending_jobs:
+            # Check and update completed jobs, unblocking their dependents
+            watched_jobs = watcher.get_completed_jobs()
+            for job_name in (watched_jobs & job_name_set) - completed_jobs:
                 completed_jobs.add(job_name)
-        
-        current_time = time.time()
-        
-        # Periodically print status update
-        if current_time - last_status_time >= 10:
-            print("[STATUS] launch_jobs: Current job status:")
-            print(f"  - Completed jobs: {len(completed_jobs)}/{len(all_job_names)}")
-            print(f"  - Pending jobs: {len(pending_jobs)}")
-            
-            # Report on jobs waiting for dependencies
-            for job in pending_jobs:
-                missing_deps = [dep for dep in job["dependencies"] if dep not in completed_jobs]
-                if missing_deps:
-                    print(f"  - Job {job['job_name']} is waiting for dependencies: {', '.join(missing_deps)}")
+                for job in dependents[job_name]:
+                    pending_deps[job["job_name"]] -= 1
+                    if pending_deps[job["job_name"]] == 0:
+                        mark_ready(job)
             
-            run_command("kubectl get jobs", check=False)
-            last_status_time = current_time
-        
-        # Try to launch jobs that meet criteria
-        for job in pending_jobs[:]:  # Use a copy of the list for iteration
-            # Check if delay time has passed
-            delay_satisfied = current_time >= job["delay_until"]
+            current_time = time.time()
             
-            # Check if dependencies are satisfied
-            deps_satisfied = all(dep in completed_jobs for dep in job["dependencies"])
+            # Periodically print status update
+            if current_time - last_status_time >= 10:
+                print("[STATUS] launch_jobs: Current job status:")
+                print(f"  - Completed jobs: {len(completed_jobs)}/{len(all_job_names)}")
+                print(f"  - Pending jobs: {len(pending_jobs)}")
+                
+                # Report on jobs waiting for dependencies
+                for job in pending_jobs.values():
+                    missing_deps = [dep for dep in job["dependencies"] if dep not in completed_jobs]
+                    if missing_deps:
+                        print(f"  - Job {job['job_name']} is waiting for dependencies: {', '.join(missing_deps)}")
+                
+                run_command("kubectl get jobs", check=False)
+                last_status_time = current_time
             
-            if delay_satisfied and deps_satisfied:
-                # Launch the job
+            # Launch the ready jobs whose delay has passed
+            while ready_jobs and ready_jobs[0][0] <= current_time:
+                _, _, job = heapq.heappop(ready_jobs)
                 yaml_path = modify_yaml_for_scheduling(
                     job["bench"],
                     job["node_type"],
@@ -173,39 +377,44 @@ def launch_jobs(configs, workdir):
                 )
                 
                 # Record the launch timestamp in milliseconds
-                launch_ms = int(time.time() * 1000)
-                with open(launch_times_path, "a") as lt:
-                    lt.write(f"Job:  {job['job_name']}\n")
-                    lt.write(f"Start time:  {launch_ms}\n")
+                launch_ms = time.time_ns() // 1_000_000
+                lt.write(f"Job:  {job['job_name']}\n")
+                lt.write(f"Start time:  {launch_ms}\n")
                 
-                # Mark as launched but keep in pending list until completion
-                pending_jobs.remove(job)
-        
-        # Pause before next iteration
-        if pending_jobs:
-            time.sleep(2)
+                # Mark as launched
+                del pending_jobs[job["job_name"]]
+            
+            # Wait for the next job completion, or until the next ready job is
+            # due, re-checking at least every 2 seconds
+            if pending_jobs:
+                wait_time = 2
+                if ready_jobs:
+                    wait_time = min(wait_time, ready_jobs[0][0] - time.time())
+                watcher.wait_for_update(watched_jobs, timeout = max(wait_time, 0))
     
     print("[STATUS] launch_jobs: All jobs launched")
     return all_job_names
 
 def wait_for_jobs(jobs, poll_interval=5, timeout=300):
     """
-    Polls the Kubernetes API until all specified Jobs have completed
+    Waits on the job watch stream until all specified Jobs have completed
     successfully or a timeout is reached.
     
     This function:
-    1) Periodically retrieves the list of Job objects in JSON format.
+    1) Reads the completed Jobs tracked by the JobWatcher.
     2) Filters for the provided `jobs` whose `.status.succeeded` count is at
        least 1.
-    3) Repeats the check every `poll_interval` seconds until all jobs are done
-       or `timeout` seconds have passed.
+    3) Repeats the check whenever a Job completes, and at least every
+       `poll_interval` seconds, until all jobs are done or `timeout` seconds
+       have passed.
     
     Parameters
     ----------
     jobs : list of str
         Names of the Kubernetes Job resources to wait for.
     poll_interval : int, optional
-        Number of seconds to wait between successive polls (default is 5).
+        Maximum number of seconds to wait between successive checks (default
+        is 5).
     timeout : int, optional
         Maximum number of seconds to wait before returning (default is 300).
         Set to 0 or None to disable the timeout.
@@ -219,6 +428,7 @@ def wait_for_jobs(jobs, poll_interval=5, timeout=300):
     last_status_time = time.time() - 30
 
     job_set = set(jobs) # Use a set for efficient lookup
+    watcher = get_job_watcher()
 
     while True:
         current_time = time.time()
@@ -227,11 +437,7 @@ def wait_for_jobs(jobs, poll_interval=5, timeout=300):
         # Check for timeout
         if timeout and elapsed_time > timeout:
             print(f"[WARNING] wait_for_jobs: Timeout of {timeout} seconds reached.")
-            out = subprocess.check_output(["kubectl","get","jobs","-o","json"])
-            data = json.loads(out)
-            done_jobs = {j["metadata"]["name"] for j in data["items"] 
-                         if j["metadata"]["name"] in job_set 
-                         and j["status"].get("succeeded",0) >= 1}
+            done_jobs = watcher.get_completed_jobs() & job_set
             pending_jobs = job_set - done_jobs
             if pending_jobs:
                 print(f"  - The following jobs did not complete: {', '.join(pending_jobs)}")
@@ -240,11 +446,8 @@ def wait_for_jobs(jobs, poll_interval=5, timeout=300):
             break
 
         # Check for job completion
-        out = subprocess.check_output(["kubectl","get","jobs","-o","json"])
-        data = json.loads(out)
-        done_jobs = {j["metadata"]["name"] for j in data["items"] 
-                     if j["metadata"]["name"] in job_set 
-                     and j["status"].get("succeeded",0) >= 1}
+        watched_jobs = watcher.get_completed_jobs()
+        done_jobs = watched_jobs & job_set
         
         if len(done_jobs) == len(jobs):
             print("[STATUS] wait_for_jobs: All jobs completed successfully.")
@@ -257,7 +460,7 @@ def wait_for_jobs(jobs, poll_interval=5, timeout=300):
             run_command("kubectl get jobs", check = False)
             last_status_time = current_time
 
-        time.sleep(poll_interval)
+        watcher.wait_for_update(watched_jobs, timeout = poll_interval)
 
 def collect_parsec_times(output_dir):
     """
@@ -265,10 +468,10 @@ def collect_parsec_times(output_dir):
     summary file.
     
     This function:
-    1) Executes `kubectl get pods -o json` and writes the full output to
-       'pods.json'.
-    2) Invokes the provided `get_time.py` script to parse timing information
-       from 'pods.json'.
+    1) Executes `kubectl get pods -o json` and streams its output through
+       `tee`, which writes the full output to 'pods.json'.
+    2) Pipes the same output into the provided `get_time.py` script to parse
+       timing information.
     3) Writes the parsed timing results to the specified `output_file`.
     
     Parameters
@@ -287,14 +490,26 @@ def collect_parsec_times(output_dir):
     # Make sure the output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
-    subprocess.run(
+    # kubectl get pods -o json | tee pods.json | python3 get_time.py -
+    kubectl = subprocess.Popen(
         ["kubectl","get","pods","-o","json"],
-        stdout = open(json_file, "w")
+        stdout = subprocess.PIPE
     )
-    subprocess.run(
-        ["python3","../get_time.py",json_file],
-        stdout = open(output_file, "w")
+    tee = subprocess.Popen(
+        ["tee", json_file],
+        stdin = kubectl.stdout,
+        stdout = subprocess.PIPE
     )
+    kubectl.stdout.close() # Only tee reads kubectl's output
+    with open(output_file, "w") as f:
+        subprocess.run(
+            ["python3","../get_time.py","-"],
+            stdin = tee.stdout,
+            stdout = f
+        )
+    tee.stdout.close()
+    tee.wait()
+    kubectl.wait()
     print(
         f"[STATUS] collect_parsec_times: Collected PARSEC times into " +
         f"{output_file}"
@@ -0,0 +1,24 @@
+import pandas as pd
+import glob
+import os
+
+
+def get_mcperf_path(folder_path, run):
+    file_list = glob.glob(os.path.join(folder_path + run, "mcperf_results*.txt"))
+
+    if len(file_list) == 0:
+        raise Exception("No txt file starting with mcperf_results* found.")
+
+    return file_list[0]
+
+
+def get_p95_latencies(folder_path, run):
+    result_path = get_mcperf_path(folder_path, run)
+
+    header = """type avg std min p5 p10 p50 p67 p75 p80 p85 p90 p95 p99 p999 p9999 QPS target ts_start ts_end"""
+    column_names = header.split()
+
+    latencies_df = pd.read_csv(result_path, sep=r'\s+', engine='python')
+    latencies_df.columns = column_names
+
+    return latencies_df[['p95', 'QPS', 'ts_start', 'ts_end']]
@@ -1,41 +1,33 @@
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import pandas as pd
 import os
 import numpy as np
-import glob
+import mmap
+import re
+from plot_common import get_p95_latencies
 
 path = "../part4_task1_d_results/"
 
+## Lines of the cpu_usage file: "<unix time>,[<core1>, <core2>, <core3>, <core4>]"
+CPU_LINE_RE = re.compile(rb"^([-+\d.eE]+),\s*\[([-+\d.eE]+),\s*([-+\d.eE]+),\s*([-+\d.eE]+),\s*([-+\d.eE]+)\]", re.M)
 
-def get_p95_latencies(folder_path, run):
-    file_list = glob.glob(os.path.join(folder_path + run, "mcperf_results*.txt"))
 
-    if len(file_list) == 0:
-        raise Exception("No txt file starting with mcperf_results* found.")
-
-    result_path = file_list[0]
-
-    header = """type avg std min p5 p10 p50 p67 p75 p80 p85 p90 p95 p99 p999 p9999 QPS target ts_start ts_end"""
-    column_names = header.split()
-
-    latencies_df = pd.read_csv(result_path, sep=r'\s+', engine='python')
-    latencies_df.columns = column_names
-
-    result_df = latencies_df.copy()
-    result_df = result_df.sort_values(by="QPS")
+def get_cpu_usage(ts_start, ts_end):
+    result_path = path + "cpu_usage"
 
-    return result_df[['p95', 'QPS', 'ts_start', 'ts_end']]
+    # One regex pass over the mapped file instead of tokenizing it as a CSV
+    with open(result_path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            rows = CPU_LINE_RE.findall(mm)
 
+    if len(rows) == 0:
+        raise Exception(f"No cpu usage rows found in {result_path}.")
 
-def get_cpu_usage(ts_start, ts_end):
-    result_path = path + "cpu_usage"
-    cpu_usage_df = pd.read_csv(result_path, header=None)
-    cpu_usage_df.columns = ["time", "core1", "core2", "core3", "core4"]
-    cpu_usage_df["time"] = cpu_usage_df["time"].astype(float) * 1000
-    cpu_usage_df["core1"] = cpu_usage_df["core1"].str.replace('[', '', regex=False).astype(float)
-    cpu_usage_df["core4"] = cpu_usage_df["core4"].str.replace(']', '', regex=False).astype(float)
+    cpu_usage_df = pd.DataFrame(np.array(rows).astype(np.float64), columns=["time", "core1", "core2", "core3", "core4"])
+    cpu_usage_df["time"] = cpu_usage_df["time"] * 1000
 
     cpu_usage_df = cpu_usage_df[(cpu_usage_df["time"] >= ts_start) & (cpu_usage_df["time"] <= ts_end)]
     return cpu_usage_df
@@ -58,7 +50,7 @@ def transform_time_QPS(cpu_df, qps_df):
 
 def export_plot(C):
     
-    p95_df = get_p95_latencies(path, f"T2_C{C}/run_1")
+    p95_df = get_p95_latencies(path, f"T2_C{C}/run_1").sort_values(by="QPS")
 
     x_axis = np.arange(0, 230000, 5000)
 
@@ -85,11 +77,20 @@ def export_plot(C):
     ax2.set_ylabel('CPU Utilization (%)')  # we already handled the x-label with ax1
 
     cpu_df = get_cpu_usage(p95_df["ts_start"].iloc[0], p95_df["ts_end"].iloc[-3])
+    # Decimate long traces to ~2000 points by averaging consecutive buckets of
+    # samples, short spikes are smoothed out but not dropped entirely
+    step = max(1, len(cpu_df) // 2000)
+    if step > 1:
+        cpu_df = cpu_df.groupby(np.arange(len(cpu_df)) // step).mean()
 
     data2_x_values = transform_time_QPS(cpu_df, p95_df)["QPS"]
     data2 = cpu_df["core1"] if C == 1 else cpu_df["core1"] + cpu_df["core2"]
-    ax2.scatter(data2_x_values, data2, color=color, marker='v', label=f'CPU Utilization (%)', zorder=5)
-    ax2.plot(data2_x_values, data2, color=color, linestyle='-', alpha=0.6)
+    ax2.scatter(data2_x_values, data2, color=color, marker='v', label=f'CPU Utilization (%)', zorder=5, rasterized=True)
+    # The CPU trace is the dense series: draw it as one rasterized collection
+    x = np.asarray(data2_x_values, dtype=np.float64)
+    y = np.asarray(data2, dtype=np.float64)
+    segments = np.column_stack([x[:-1], y[:-1], x[1:], y[1:]]).reshape(-1, 2, 2)
+    ax2.add_collection(LineCollection(segments, colors=color, linestyles='-', alpha=0.6, rasterized=True))
     ax2.tick_params(axis='y')
     ax2.set_ylim(0, 100 if C == 1 else 200)
     ax2.set_xlim(0, 230000)
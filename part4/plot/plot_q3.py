@@ -3,8 +3,14 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import pandas as pd
 import argparse
+import glob
 import os
+import re
+import io
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from plot_common import get_mcperf_path
 
 ## Colors (from main.tex)
 colors = {
@@ -19,96 +25,231 @@ colors = {
 
 path = "../results/"
 
+## Figure reused by every export, see get_figure()
+figure = None
+
+## Events written by SchedulerLogger
+LOG_EVENTS = ("start", "end", "update_cores", "pause", "unpause", "custom")
+
+
+def get_logger_df(folder_path, run_number, log_utc_offset=0.0):
+    file_list = glob.glob(os.path.join(folder_path + run_number, "log*.txt"))
+
+    if len(file_list) == 0:
+        raise Exception("No txt file starting with log* found.")
+
+    logger_path = file_list[0]
+
+    with open(logger_path, "r") as file:
+        content = file.read()
+
+    # Custom comments are URL-quoted, so every line has at most five
+    # whitespace separated fields and the C tokenizer can split the whole log
+    raw = pd.read_csv(io.StringIO(content), sep=r'\s+', engine='c', header=None, dtype=str,
+                      names=["timestamp", "type", "task", "arg1", "arg2"], on_bad_lines='skip')
+
+    # Lines with more fields (e.g. an unquoted comment) are dropped by the
+    # tokenizer, count them so that they are still reported
+    num_lines = sum(1 for line in content.splitlines() if line.strip())
+    skipped = num_lines - len(raw)
+
+    valid = raw["type"].isin(LOG_EVENTS) & raw["timestamp"].str.fullmatch(r"\d{4}-\d{2}-\d{2}T[\d:.]+")
+
+    # Report once instead of writing to stdout for every bad line
+    unmatched = raw[~valid]
+    if len(unmatched) > 0 or skipped > 0:
+        summary = f"{len(unmatched) + skipped} unmatched lines ({skipped} with too many fields"
+        if len(unmatched) > 0:
+            summary += f", first other: {' '.join(unmatched.iloc[0].dropna())!r}"
+        print(summary + ")")
+
+    raw = raw[valid]
+    df = raw[["timestamp", "type", "task"]].copy()
+    df["cores"] = raw["arg1"].where(raw["type"].isin(["start", "update_cores"]))
+    df["threads"] = raw["arg2"].where(raw["type"] == "start")
+    df["comment"] = raw["arg1"].where(raw["type"] == "custom")
+    df = df.reset_index(drop=True)
+
+    # SchedulerLogger writes naive local times (datetime.now()), which numpy
+    # parses in C as if they were UTC. They are only epoch milliseconds once
+    # the scheduler host's UTC offset (in hours, 0 for the UTC cluster VMs)
+    # is subtracted
+    timestamps = df["timestamp"].to_numpy(dtype="U26").astype("datetime64[us]")
+    timestamps = timestamps - np.timedelta64(int(round(log_utc_offset * 3600 * 1e6)), "us")
+    df["timestamp_ms"] = timestamps.astype(np.int64) // 1000
+    df = df.drop(columns="timestamp")
+    # Core ids stay strings, conversion is left to the callers that need ints
+    df["cores"] = df["cores"].str.findall(r"\d+")
+
+    return df
+
+
 def get_p95_latencies(folder_path, run_number):
-    result_path = folder_path + run_number + "/mcperf_results_local.txt"
+    result_path = get_mcperf_path(folder_path, run_number)
 
-    header = """type avg std min p5 p10 p50 p67 p75 p80 p85 p90 p95 p99 p999 p9999 QPS target ts_start ts_end"""
-    column_names = header.split()
+    timestamp_start = None
+    timestamp_end = None
+    interval_line = None
+    read_lines = []
 
-    latencies_df = pd.read_csv(result_path, sep=r'\s+', engine='python')
-    latencies_df.columns = column_names
+    with open(result_path, "r") as file:
+        content = file.read()
 
-    result_df = latencies_df.copy()
+    # Single pass: the header timestamps come first, the read rows after
+    for line in content.splitlines():
+        s = line.strip()
+        if timestamp_start is None and s.startswith("Timestamp start:"):
+            timestamp_start = int(s.split(":", 1)[1].strip())
+        elif timestamp_end is None and s.startswith("Timestamp end:"):
+            timestamp_end = int(s.split(":", 1)[1].strip())
+        elif interval_line is None and "Total number of intervals" in s:
+            interval_line = s
+        elif s.startswith("read"):
+            read_lines.append(s)
 
-    return result_df[['p95', 'QPS']]
+    if timestamp_start is None or timestamp_end is None:
+        raise Exception(f"No start/end timestamps found in {result_path}.")
+    if len(read_lines) == 0:
+        raise Exception(f"No read rows found in {result_path}.")
 
+    # Columns: type avg std min p5 p10 p50 p67 p75 p80 p85 p90 p95 p99 p999 p9999 QPS target
+    latencies = np.loadtxt(read_lines, usecols=(12, 16), dtype=np.float32, ndmin=2)
+    num_rows = len(latencies)
 
-def export_plot_A(p95_df, folder, run_number):
-    x_axis = np.arange(0, 230000, 5000)
+    if interval_line is not None:
+        num_intervals = int(re.search(r"\d+", interval_line).group())
+    else:
+        num_intervals = num_rows
 
-    fig, ax1 = plt.subplots()
+    # Each read row covers one equally long interval of the run
+    interval_ms = (timestamp_end - timestamp_start) / num_intervals
+    timestamps_ms = timestamp_start + np.arange(num_rows) * interval_ms
 
-    color = 'tab:red'
-    ax1.set_xlabel('Time')
-    ax1.set_ylabel('95th Percentile Latency (µs)', color=color)
-    ax1.plot(x_axis, data1, color=color)
-    ax1.tick_params(axis='y', labelcolor=color)
+    # Only the absolute timestamps need float64 precision
+    result_df = pd.DataFrame({
+        'p95': latencies[:, 0],
+        'QPS': latencies[:, 1],
+        'unix_timestamp': timestamps_ms / 1000.0,
+        'start_time': ((timestamps_ms - timestamp_start) / 1000.0).astype(np.float32),
+        'duration': np.full(num_rows, interval_ms / 1000.0, dtype=np.float32),
+    }, copy=False)
 
-    ax2 = ax1.twinx()  # instantiate a second Axes that shares the same x-axis
+    return result_df
 
-    color = 'tab:blue'
-    ax2.set_ylabel('Achieved Queries per Second (QPS)', color=color)  # we already handled the x-label with ax1
-    ax2.plot(x_axis, data2, color=color)
-    ax2.tick_params(axis='y', labelcolor=color)
 
-    fig.tight_layout()  # otherwise the right y-label is slightly clipped
-    
-    plt.show()
+def get_figure():
+    global figure
 
-    os.makedirs(folder, exist_ok=True)
-    file_path = os.path.join(folder, run_number.replace("run_", "") + "A" + ".png")
-    plt.savefig(file_path, dpi=300)
+    if figure is None:
+        figure = plt.figure(figsize=(12, 6))
+    figure.clear()
 
-    plt.close()
+    return figure
 
 
-def export_plot_B(p95_df, folder, run_number):
+def export_plot_A(p95_df, folder, run_number, dpi):
+    positions = p95_df['start_time']
+    bar_width = p95_df['duration'] / 2
 
-    x_axis = np.arange(0, 230000, 5000)
+    # QPS is rescaled into latency units so both series share one axis,
+    # the secondary axis maps the ticks back to QPS
+    p95_max = p95_df['p95'].max()
+    qps_max = p95_df['QPS'].max()
+    qps_scaled = p95_df['QPS'] * (p95_max / qps_max)
 
-    fig, ax1 = plt.subplots()
+    fig = get_figure()
+    ax1 = fig.add_subplot(111)
 
     color = 'tab:red'
-    ax1.set_xlabel('Time')  
-    ax1.set_ylabel('Number of CPU cores allocated to memcached', color=color)
-    ax1.plot(x_axis, data1, color=color)
+    ax1.bar(positions, p95_df['p95'], width=bar_width, align='edge', color=color, label='95th Percentile Latency (µs)')
+    ax1.set_xlabel('Time (s)')
+    ax1.set_ylabel('95th Percentile Latency (µs)', color=color)
     ax1.tick_params(axis='y', labelcolor=color)
 
-    ax2 = ax1.twinx()  # instantiate a second Axes that shares the same x-axis
+    color = 'tab:blue'
+    ax1.bar(positions + bar_width, qps_scaled, width=bar_width, align='edge', color=color, label='Achieved Queries per Second (QPS)')
+    ax2 = ax1.secondary_yaxis('right', functions=(lambda y: y * (qps_max / p95_max), lambda y: y * (p95_max / qps_max)))
+    ax2.set_ylabel('Achieved Queries per Second (QPS)', color=color)
+    ax2.tick_params(axis='y', labelcolor=color)
+
+    ax1.grid(True, axis='y', linestyle='--', alpha=0.4)
+    ax1.legend(loc='upper left')
+    fig.tight_layout()
+
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, run_number.replace("run_", "") + "A" + ".png")
+    fig.savefig(file_path, dpi=dpi)
+
+
+def export_plot_B(p95_df, logger_df, folder, run_number, dpi):
+    # Cores given to memcached, as a step function of time since mcperf start
+    run_start_ms = p95_df['unix_timestamp'].iloc[0] * 1000
+    run_end = p95_df['start_time'].iloc[-1] + p95_df['duration'].iloc[-1]
+
+    memcached_df = logger_df[(logger_df['task'] == 'memcached') & (logger_df['type'].isin(['start', 'update_cores']))]
+    if len(memcached_df) > 0:
+        cores_time = (memcached_df['timestamp_ms'] - run_start_ms) / 1000
+        cores_count = memcached_df['cores'].str.len()
+        cores_time = np.append(cores_time.to_numpy(), run_end)
+        cores_count = np.append(cores_count.to_numpy(), cores_count.iloc[-1])
+        cores_max = max(cores_count.max(), 1)
+    else:
+        print(f"[WARNING] export_plot_B: No memcached core allocation in the log of {run_number}, skipping the core count line")
+        cores_count = None
+        cores_max = 1
+    qps_max = p95_df['QPS'].max()
+    qps_scaled = p95_df['QPS'] * (cores_max / qps_max)
+
+    fig = get_figure()
+    ax1 = fig.add_subplot(111)
 
     color = 'tab:blue'
-    ax2.set_ylabel('Achieved Queries per Second (QPS)', color=color)  # we already handled the x-label with ax1
-    ax2.plot(x_axis, data2, color=color)
+    ax1.bar(p95_df['start_time'], qps_scaled, width=p95_df['duration'], align='edge', color=color, alpha=0.4, label='Achieved Queries per Second (QPS)')
+    ax2 = ax1.secondary_yaxis('right', functions=(lambda y: y * (qps_max / cores_max), lambda y: y * (cores_max / qps_max)))
+    ax2.set_ylabel('Achieved Queries per Second (QPS)', color=color)
     ax2.tick_params(axis='y', labelcolor=color)
 
-    fig.tight_layout()  # otherwise the right y-label is slightly clipped
-    
-    plt.show()
+    color = 'tab:red'
+    if cores_count is not None:
+        ax1.step(cores_time, cores_count, where='post', color=color, label='Number of CPU cores allocated to memcached')
+    ax1.set_xlabel('Time (s)')
+    ax1.set_ylabel('Number of CPU cores allocated to memcached', color=color)
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax1.set_xlim(0, run_end)
+
+    ax1.grid(True, axis='y', linestyle='--', alpha=0.4)
+    ax1.legend(loc='upper left')
+    fig.tight_layout()
 
     os.makedirs(folder, exist_ok=True)
     file_path = os.path.join(folder, run_number.replace("run_", "") + "B" + ".png")
-    plt.savefig(file_path, dpi=300)
+    fig.savefig(file_path, dpi=dpi)
 
-    plt.close()
 
-
-def export_plots(folder, run_number):
-    folder_path = path + folder + '/' + run_number
+def export_plots(folder, run_number, dpi, log_utc_offset):
+    folder_path = path + folder + '/'
     
-    p95_df = get_p95_latencies(folder_path)
+    p95_df = get_p95_latencies(folder_path, run_number)
+    logger_df = get_logger_df(folder_path, run_number, log_utc_offset)
+
+    export_plot_A(p95_df, folder, run_number, dpi)
+    export_plot_B(p95_df, logger_df, folder, run_number, dpi)
 
-    export_plot_A(p95_df, folder, run_number)
-    export_plot_B(p95_df, folder, run_number)
 
+def main(folder, dpi, log_utc_offset):
+    runs = ["run_1", "run_2", "run_3"]
 
-def main(folder):
-    export_plots(folder, "run_1")
-    export_plots(folder, "run_2")
-    export_plots(folder, "run_3")
+    # Runs are independent, each worker process parses and renders one of them
+    # with its own reusable figure
+    with ProcessPoolExecutor(max_workers=min(len(runs), os.cpu_count() or 1)) as executor:
+        list(executor.map(partial(export_plots, folder, dpi=dpi, log_utc_offset=log_utc_offset), runs))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process runs from a specified folder.")
     parser.add_argument("folder", help="Folder containing run subdirectories")
+    parser.add_argument("--dpi", type=int, default=150, help="Resolution of the exported PNGs")
+    parser.add_argument("--log-utc-offset", type=float, default=0.0,
+                        help="UTC offset in hours of the host that wrote the scheduler log")
     args = parser.parse_args()
 
-    main(args.folder)
+    main(args.folder, args.dpi, args.log_utc_offset)